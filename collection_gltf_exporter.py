@@ -10,8 +10,11 @@ bl_info = {
 
 import bpy
 import os
-from bpy.types import Panel, Operator, PropertyGroup
+import re
+import sys
+from bpy.types import Panel, Operator, PropertyGroup, UIList
 from bpy.props import StringProperty, PointerProperty
+from bpy.app.handlers import persistent
 
 # ===== PROPERTIES =====
 
@@ -28,9 +31,30 @@ class GLTF_Properties(PropertyGroup):
         description="Create subfolders based on collection hierarchy",
         default=False
     )
+    export_format: bpy.props.EnumProperty(
+        name="Export Format",
+        description="File layout written for each collection",
+        items=[
+            ('GLB', "Single .glb", "One binary file per collection"),
+            ('GLTF_SEPARATE', ".gltf + .bin", "JSON file with separate binary and texture files"),
+        ],
+        default='GLB'
+    )
+    active_index: bpy.props.IntProperty(default=0)
 
 # ===== UI PANEL =====
 
+class GLTF_UL_collections(UIList):
+    """Collection list showing export toggles and object counts"""
+
+    def draw_item(self, context, layout, data, item, icon, active_data, active_propname, index):
+        row = layout.row(align=True)
+        row.prop(item, "export_gltf", text="")
+        count = _object_counts.get(item.name_full)
+        if count is None:
+            count = len(item.objects)
+        row.label(text=f"{item.name} ({count} objects)")
+
 class GLTF_PT_collection_exporter(Panel):
     """Panel in the N-panel for GLTF Collection Export"""
     bl_label = "GLTF Collection Exporter"
@@ -50,6 +74,7 @@ class GLTF_PT_collection_exporter(Panel):
         
         box.prop(gltf_props, "export_path", text="Export Path")
         box.prop(gltf_props, "use_collection_structure", text="Use Collection Folders")
+        box.prop(gltf_props, "export_format", text="Format")
         
         if gltf_props.export_path:
             box.label(text=f"Will export to: {gltf_props.export_path}", icon='CHECKMARK')
@@ -79,20 +104,8 @@ class GLTF_PT_collection_exporter(Panel):
         if len(bpy.data.collections) == 0:
             box.label(text="No collections found", icon='INFO')
         else:
-            for collection in bpy.data.collections:
-                row = box.row(align=True)
-                
-                # Toggle checkbox
-                export_enabled = collection.get("export_gltf", False)
-                
-                # Create a custom operator for each collection
-                props = row.operator("gltf.toggle_collection", 
-                                   text="", 
-                                   icon='CHECKBOX_HLT' if export_enabled else 'CHECKBOX_DEHLT')
-                props.collection_name = collection.name
-                
-                # Collection name and object count
-                row.label(text=f"{collection.name} ({len(collection.objects)} objects)")
+            # UIList only draws the visible rows and reads cached object counts
+            box.template_list("GLTF_UL_collections", "", bpy.data, "collections", gltf_props, "active_index")
 
 # ===== OPERATORS =====
 
@@ -110,29 +123,14 @@ class GLTF_OT_export_collections(Operator):
         # Use custom path or default
         export_path = custom_path if custom_path else None
         
-        export_collections_to_gltf(export_path)
-        self.report({'INFO'}, "Collection export completed! Check console for details.")
-        return {'FINISHED'}
-
-class GLTF_OT_toggle_collection(Operator):
-    """Toggle collection export status"""
-    bl_idname = "gltf.toggle_collection"
-    bl_label = "Toggle Collection Export"
-    bl_options = {'REGISTER'}
-    
-    collection_name: StringProperty()
-
-    def execute(self, context):
-        if self.collection_name in bpy.data.collections:
-            collection = bpy.data.collections[self.collection_name]
-            current_status = collection.get("export_gltf", False)
-            collection["export_gltf"] = not current_status
-            
-            status = "enabled" if not current_status else "disabled"
-            self.report({'INFO'}, f"Collection '{self.collection_name}' export {status}")
-        else:
-            self.report({'ERROR'}, f"Collection '{self.collection_name}' not found")
-        
+        exported_count = export_collections_to_gltf(
+            export_path,
+            gltf_props.use_collection_structure,
+            context.scene,
+            context.view_layer,
+            gltf_props.export_format
+        )
+        self.report({'INFO'}, f"Exported {exported_count} collections. Check console for details.")
         return {'FINISHED'}
 
 class GLTF_OT_enable_all_collections(Operator):
@@ -163,13 +161,38 @@ def register():
     for cls in classes:
         bpy.utils.register_class(cls)
     
-    # Register the property group
+    # Register the property group and the per-collection export property
     bpy.types.Scene.gltf_export_props = PointerProperty(type=GLTF_Properties)
+    bpy.types.Collection.export_gltf = bpy.props.BoolProperty(
+        name="Export GLTF",
+        description="Export this collection as a GLTF file",
+        default=False
+    )
+    
+    # Keep the cached object counts in sync with collection changes
+    bpy.app.handlers.depsgraph_update_post.append(_on_depsgraph_update)
+    bpy.app.handlers.load_post.append(_on_data_reloaded)
+    bpy.app.handlers.undo_post.append(_on_data_reloaded)
+    bpy.app.handlers.redo_post.append(_on_data_reloaded)
+    
+    # bpy.data is not available during registration, so fill the object counts right after
+    bpy.app.timers.register(_update_cached_object_counts, first_interval=0.0)
     
     print("GLTF Collection Exporter: Addon registered successfully!")
 
 def unregister():
-    # Unregister the property group
+    # Remove the object count handlers
+    if bpy.app.timers.is_registered(_update_cached_object_counts):
+        bpy.app.timers.unregister(_update_cached_object_counts)
+    if _on_depsgraph_update in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(_on_depsgraph_update)
+    for handlers in (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+        if _on_data_reloaded in handlers:
+            handlers.remove(_on_data_reloaded)
+    _object_counts.clear()
+    
+    # Unregister the property group and the per-collection export property
+    del bpy.types.Collection.export_gltf
     del bpy.types.Scene.gltf_export_props
     
     for cls in reversed(classes):
@@ -198,7 +221,7 @@ def toggle_collection_export(collection_name, enabled=True):
     """
     if collection_name in bpy.data.collections:
         collection = bpy.data.collections[collection_name]
-        collection["export_gltf"] = enabled
+        collection.export_gltf = enabled
         status = "enabled" if enabled else "disabled"
         print(f"Collection '{collection_name}' export {status}")
     else:
@@ -206,57 +229,139 @@ def toggle_collection_export(collection_name, enabled=True):
 
 def enable_all_collections_for_export():
     """Enable all collections for export."""
-    for collection in bpy.data.collections:
-        collection["export_gltf"] = True
-    print(f"Enabled {len(bpy.data.collections)} collections for export")
+    collections = bpy.data.collections
+    # Set every flag in a single call instead of one RNA write per collection
+    collections.foreach_set("export_gltf", [True] * len(collections))
+    print(f"Enabled {len(collections)} collections for export")
 
 def disable_all_collections_for_export():
     """Disable all collections for export."""
-    for collection in bpy.data.collections:
-        collection["export_gltf"] = False
-    print(f"Disabled {len(bpy.data.collections)} collections for export")
+    collections = bpy.data.collections
+    collections.foreach_set("export_gltf", [False] * len(collections))
+    print(f"Disabled {len(collections)} collections for export")
+
+# Characters that are not allowed in exported file names
+_SANITIZE_RE = re.compile(r'[^\w \-]')
+
+# Object counts for the UI list by collection name_full. Kept in memory rather than
+# on the collections so linked (read-only) collections work and nothing is saved to the .blend
+_object_counts = {}
+
+def _update_cached_object_counts():
+    """Refresh the cached object count of each collection for the UI list."""
+    _object_counts.clear()
+    _object_counts.update(
+        (collection.name_full, len(collection.objects)) for collection in bpy.data.collections
+    )
 
-def get_collection_hierarchy_path(collection):
+@persistent
+def _on_depsgraph_update(scene, depsgraph):
+    """Refresh cached object counts when any collection is updated."""
+    if any(isinstance(update.id, bpy.types.Collection) for update in depsgraph.updates):
+        _update_cached_object_counts()
+
+@persistent
+def _on_data_reloaded(*args):
+    """Refresh cached object counts after a file load, undo or redo."""
+    _update_cached_object_counts()
+
+def _build_parent_index():
+    """
+    Build a mapping of child collection name to parent collection name.
+    Walks bpy.data.collections once so hierarchy lookups don't have to.
+    """
+    parent_of = {}
+    for parent_collection in bpy.data.collections:
+        for child in parent_collection.children:
+            parent_of.setdefault(child.name, parent_collection.name)
+    return parent_of
+
+def get_collection_hierarchy_path(collection, parent_of, cache=None):
     """
     Get the folder path based on collection hierarchy.
-    Returns a list of parent collection names from root to the collection's parent.
+    Returns a list of parent collection names from the collection's parent up to the root.
+    
+    Args:
+        collection: The collection to resolve
+        parent_of (dict): Child to parent name index from _build_parent_index()
+        cache (dict): Optional paths already resolved from the same parent_of index,
+            so collections sharing ancestors stop at the first resolved one
     """
     hierarchy = []
+    name = collection.name
+    while name in parent_of:
+        if cache is not None and name in cache:
+            hierarchy.extend(cache[name])
+            break
+        name = parent_of[name]
+        hierarchy.append(name)
     
-    # Find all parent collections by checking which collections contain this one
-    def find_parents(target_collection, current_path=[]):
-        for parent_collection in bpy.data.collections:
-            if target_collection.name in [child.name for child in parent_collection.children]:
-                new_path = current_path + [parent_collection.name]
-                # Check if this parent has its own parent
-                parent_found = False
-                for grandparent in bpy.data.collections:
-                    if parent_collection.name in [child.name for child in grandparent.children]:
-                        parent_found = True
-                        break
-                
-                if parent_found:
-                    return find_parents(parent_collection, new_path)
-                else:
-                    return new_path
-        return current_path
-    
-    return find_parents(collection)
+    if cache is not None:
+        cache[collection.name] = hierarchy
+    return list(hierarchy)
     """Print the export status of all collections."""
     print("\n=== Collection Export Status ===")
     for collection in bpy.data.collections:
-        status = "✓" if collection.get("export_gltf", False) else "✗"
+        status = "✓" if collection.export_gltf else "✗"
         print(f"{status} {collection.name}")
     print("================================\n")
 
-def export_collections_to_gltf(export_path=None):
+def _folder_problem(folder):
+    """Return why exports can't be written to folder, or None if they can."""
+    if not os.path.exists(folder):
+        return "does not exist"
+    if not os.path.isdir(folder):
+        return "is not a folder"
+    if not os.access(folder, os.W_OK):
+        return "is not writable"
+    return None
+
+def _create_collection_folders(collections, export_path, log):
+    """
+    Resolve the hierarchy folder of each collection and create each unique folder once.
+    Returns a dict of collection name to folder for collections that have parents.
+    Progress messages are appended to log.
+    """
+    # The path cache is only valid for this index, so both are rebuilt together
+    parent_of = _build_parent_index()
+    hierarchy_cache = {}
+    export_dirs = {}
+    for collection in collections:
+        hierarchy = get_collection_hierarchy_path(collection, parent_of, hierarchy_cache)
+        if hierarchy:
+            # Reverse the hierarchy so it goes from root to parent
+            export_dirs[collection.name] = os.path.join(export_path, *reversed(hierarchy))
+    
+    for folder in sorted(set(export_dirs.values())):
+        # A failed folder is left missing, so its collections are skipped later
+        try:
+            os.makedirs(folder, exist_ok=True)
+        except OSError as e:
+            log.append(f"Could not create folder {folder}: {str(e)}")
+            continue
+        log.append(f"Created/using folder structure: {os.path.relpath(folder, export_path)}")
+    
+    return export_dirs
+
+def export_collections_to_gltf(export_path, use_structure, scene, view_layer, export_format='GLB'):
     """
     Export each collection as a separate GLTF file.
-    Only exports collections that have the 'export_gltf' custom property set to True.
+    Only exports collections that have the 'export_gltf' property enabled.
+    
+    Args:
+        export_path (str): Target folder, or None for the default location
+        use_structure (bool): Create subfolders based on collection hierarchy
+        scene: Scene whose objects are exported
+        view_layer: View layer used for selection and the active object
+        export_format (str): 'GLB' for one binary file per collection,
+            'GLTF_SEPARATE' for .gltf with separate .bin and textures
+    
+    Returns:
+        int: Number of collections exported
     """
     
-    # Get the use_collection_structure setting
-    use_structure = bpy.context.scene.gltf_export_props.use_collection_structure
+    # Console messages are buffered and written out once at the end
+    log = []
     
     # Set export path - defaults to blend file directory or desktop
     if export_path is None:
@@ -266,114 +371,141 @@ def export_collections_to_gltf(export_path=None):
             export_path = os.path.expanduser("~/Desktop")
     
     # Store original selection, active object, and mode
-    original_selection = bpy.context.selected_objects.copy()
-    original_active = bpy.context.active_object
-    original_mode = bpy.context.object.mode if bpy.context.object else 'OBJECT'
+    original_selection = list(view_layer.objects.selected)
+    original_active = view_layer.objects.active
+    original_mode = original_active.mode if original_active else 'OBJECT'
     
-    # Switch to object mode if not already there
-    if bpy.context.object and bpy.context.object.mode != 'OBJECT':
-        bpy.ops.object.mode_set(mode='OBJECT')
-        print(f"Switched from {original_mode} mode to OBJECT mode for export")
+    # Objects this export has selected, cleared again when the original selection is restored
+    currently_selected = set(original_selection)
     
-    # Clear current selection
-    bpy.ops.object.select_all(action='DESELECT')
+    # Snapshot scene membership once instead of querying RNA per object
+    scene_obj_names = {obj.name for obj in scene.objects}
     
     exported_count = 0
     
-    # Loop through all collections in the scene
-    for collection in bpy.data.collections:
-        # Check if this collection is marked for export
-        export_enabled = collection.get("export_gltf", False)
+    # Restore selection and mode and flush the log even if setup or an export raises
+    try:
+        # Switch to object mode only if strictly needed
+        if original_active and original_mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+            log.append(f"Switched from {original_mode} mode to OBJECT mode for export")
         
-        if not export_enabled:
-            print(f"Skipping collection (export disabled): {collection.name}")
-            continue
-            
-        # Skip empty collections
-        if not collection.objects:
-            print(f"Skipping empty collection: {collection.name}")
-            continue
-            
-        # Clear selection
-        bpy.ops.object.select_all(action='DESELECT')
+        # Clear current selection directly rather than through the select_all operator,
+        # tracking what is selected so later passes only deselect those objects
+        for obj in currently_selected:
+            obj.select_set(False)
+        currently_selected.clear()
         
-        # Select all objects in this collection
-        objects_in_collection = []
-        for obj in collection.objects:
-            # Only select if object is in the current scene
-            if obj.name in bpy.context.scene.objects:
-                obj.select_set(True)
-                objects_in_collection.append(obj)
+        # Only collections marked for export that contain objects are visited
+        enabled_collections = [
+            collection for collection in bpy.data.collections
+            if collection.export_gltf and collection.objects
+        ]
         
-        # Skip if no valid objects found
-        if not objects_in_collection:
-            print(f"No valid objects in collection: {collection.name}")
-            continue
-            
-        # Set one of the objects as active (required for export)
-        bpy.context.view_layer.objects.active = objects_in_collection[0]
+        # Flat exports skip hierarchy resolution and folder creation entirely. Only
+        # collections with objects in this scene get exported, so only they need folders.
+        # Nothing is created under an export root that is missing or not writable
+        export_dirs = {}
+        if use_structure and _folder_problem(export_path) is None:
+            exportable_collections = [
+                collection for collection in enabled_collections
+                if any(obj.name in scene_obj_names for obj in collection.objects)
+            ]
+            export_dirs = _create_collection_folders(exportable_collections, export_path, log)
+        
+        # Check each target folder once up front rather than letting the exporter fail on it
+        folder_problems = {
+            folder: _folder_problem(folder)
+            for folder in {export_path, *export_dirs.values()}
+        }
         
-        # Determine the export directory
-        final_export_path = export_path
+        extension = ".glb" if export_format == 'GLB' else ".gltf"
         
-        if use_structure:
-            # Get the collection hierarchy
-            hierarchy = get_collection_hierarchy_path(collection)
-            if hierarchy:
-                # Reverse the hierarchy so it goes from root to parent
-                hierarchy.reverse()
-                # Create subfolder path
-                subfolder_path = os.path.join(*hierarchy)
-                final_export_path = os.path.join(export_path, subfolder_path)
+        # Loop through the collections marked for export
+        for collection in enabled_collections:
+            # Determine the export directory and file name
+            final_export_path = export_dirs.get(collection.name, export_path)
+            problem = folder_problems[final_export_path]
+            if problem:
+                log.append(f"Skipping collection '{collection.name}': {final_export_path} {problem}")
+                continue
+            
+            # Create filename using only the collection name
+            safe_collection_name = _SANITIZE_RE.sub('', collection.name).rstrip()
+            if not safe_collection_name:
+                log.append(f"Skipping collection '{collection.name}': name has no valid file name characters")
+                continue
+            filename = f"{safe_collection_name}{extension}"
+            filepath = os.path.join(final_export_path, filename)
+            
+            # Clear the previous collection's selection
+            for obj in currently_selected:
+                obj.select_set(False)
+            currently_selected.clear()
+            
+            # Select all objects in this collection
+            objects_in_collection = []
+            for obj in collection.objects:
+                # Only select if object is in the current scene
+                if obj.name in scene_obj_names:
+                    obj.select_set(True)
+                    objects_in_collection.append(obj)
+            currently_selected.update(objects_in_collection)
+            
+            # Skip if no valid objects found
+            if not objects_in_collection:
+                log.append(f"No valid objects in collection: {collection.name}")
+                continue
                 
-                # Create the directory if it doesn't exist
-                os.makedirs(final_export_path, exist_ok=True)
-                print(f"Created/using folder structure: {subfolder_path}")
+            # Set one of the objects as active (required for export)
+            view_layer.objects.active = objects_in_collection[0]
+            
+            # Export selected objects; Blender operators raise RuntimeError
+            try:
+                bpy.ops.export_scene.gltf(
+                    filepath=filepath,
+                    export_format=export_format,
+                    use_selection=True,  # Only export selected objects
+                    export_apply=True    # Apply modifiers before export
+                )
+                log.append(f"Exported collection '{collection.name}' to: {filepath}")
+                exported_count += 1
+                
+            except RuntimeError as e:
+                log.append(f"Failed to export collection '{collection.name}': {str(e)}")
         
-        # Create filename using only the collection name
-        safe_collection_name = "".join(c for c in collection.name if c.isalnum() or c in (' ', '-', '_')).rstrip()
+        structure_note = " (with folder structure)" if use_structure else ""
+        log.append(f"\nExport complete! {exported_count} collections exported to: {export_path}{structure_note}")
+    finally:
+        # Restore original selection, active object, and mode
+        for obj in currently_selected:
+            obj.select_set(False)
+        for obj in original_selection:
+            if obj.name in scene_obj_names:
+                obj.select_set(True)
+        view_layer.objects.active = original_active
         
-        filename = f"{safe_collection_name}.gltf"
-        filepath = os.path.join(final_export_path, filename)
+        # Restore original mode if we changed it
+        if original_active and original_mode != 'OBJECT':
+            try:
+                bpy.ops.object.mode_set(mode=original_mode)
+                log.append(f"Restored to {original_mode} mode")
+            except:
+                log.append(f"Could not restore to {original_mode} mode, staying in OBJECT mode")
         
-        # Export selected objects as GLTF
-        try:
-            bpy.ops.export_scene.gltf(
-                filepath=filepath,
-                use_selection=True,  # Only export selected objects
-                export_apply=True    # Apply modifiers before export
-            )
-            print(f"Exported collection '{collection.name}' to: {filepath}")
-            exported_count += 1
-            
-        except Exception as e:
-            print(f"Failed to export collection '{collection.name}': {str(e)}")
-    
-    # Restore original selection, active object, and mode
-    bpy.ops.object.select_all(action='DESELECT')
-    for obj in original_selection:
-        if obj.name in bpy.context.scene.objects:
-            obj.select_set(True)
-    bpy.context.view_layer.objects.active = original_active
-    
-    # Restore original mode if we changed it
-    if original_active and original_mode != 'OBJECT':
-        try:
-            bpy.ops.object.mode_set(mode=original_mode)
-            print(f"Restored to {original_mode} mode")
-        except:
-            print(f"Could not restore to {original_mode} mode, staying in OBJECT mode")
+        # Write the console trail even when the export was interrupted
+        sys.stdout.write("\n".join(log) + "\n")
+        sys.stdout.flush()
     
-    structure_note = " (with folder structure)" if use_structure else ""
-    print(f"\nExport complete! {exported_count} collections exported to: {export_path}{structure_note}")
+    return exported_count
 
 # ===== REGISTRATION =====
 
 classes = [
     GLTF_Properties,
+    GLTF_UL_collections,
     GLTF_PT_collection_exporter,
     GLTF_OT_export_collections,
-    GLTF_OT_toggle_collection,
     GLTF_OT_enable_all_collections,
     GLTF_OT_disable_all_collections,
 ]